@@ -0,0 +1,65 @@
+"""Deterministic payload corpora for the benchmark suite."""
+import random
+
+SERVICES = ["checkout", "payments", "auth", "search", "inventory", "gateway"]
+
+_BENIGN = [
+    "GET /api/v1/items?page={n} 200 {ms}ms",
+    "user {n} logged in from 10.0.{a}.{b}",
+    "cache refresh completed in {ms}ms ({n} keys)",
+    "POST /api/v1/orders 201 order_id={n}",
+    "health probe ok latency {ms}ms",
+    "scheduled job reindex finished, {n} documents",
+    "DBConnectionTimeout after {ms}ms on pool primary",
+    "upstream timeout contacting inventory after {ms}ms",
+]
+
+_MALICIOUS = [
+    "GET /search?q=<script>alert({n})</script>",
+    "GET /item?id={n}' OR 1=1 -- ",
+    "POST /login user=admin'; DROP TABLE users;--",
+    "GET /p?id={n} UNION SELECT username,password FROM users",
+    "GET /fetch?url=http://169.254.169.254/latest/meta-data/",
+    "GET /img?src=javascript:alert(document.cookie)",
+    "GET /proxy?u=gopher://127.0.0.1:6379/_FLUSHALL",
+    "GET /q?x=%3Cimg%20src%3Dx%20onerror%3Dalert({n})%3E",
+    "GET /r?f=file:///etc/passwd&n={n}",
+    "GET /s?q=select * from information_schema.tables where {n}=1",
+]
+
+
+def _fill(rng, template):
+    return template.format(n=rng.randint(1, 10**6), ms=rng.randint(5, 5000),
+                           a=rng.randint(0, 255), b=rng.randint(0, 255))
+
+
+def payloads(n: int, malicious_ratio: float = 0.3, seed: int = 1337) -> list[str]:
+    """Return ``n`` log payloads, ``malicious_ratio`` of which carry an attack string."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        pool = _MALICIOUS if rng.random() < malicious_ratio else _BENIGN
+        out.append(_fill(rng, rng.choice(pool)))
+    return out
+
+
+def events(n: int, malicious_ratio: float = 0.3, seed: int = 1337) -> list[dict]:
+    """Return ``n`` API-shaped events (source/type/payload/metadata), ~10% latency metrics."""
+    rng = random.Random(seed + 1)
+    out = []
+    for p in payloads(n, malicious_ratio, seed):
+        svc = rng.choice(SERVICES)
+        if rng.random() < 0.1:
+            out.append({"source": svc, "type": "metric",
+                        "payload": f"p95 latency {rng.randint(20, 900)} ms", "metadata": {"bench": True}})
+        else:
+            out.append({"source": svc, "type": "log", "payload": p, "metadata": {"bench": True}})
+    return out
+
+
+def storm_events(n: int, service: str = "payments", seed: int = 1337) -> list[dict]:
+    """Return ``n`` near-identical DBConnectionTimeout log events from one service."""
+    rng = random.Random(seed + 2)
+    return [{"source": service, "type": "log",
+             "payload": f"DBConnectionTimeout after {rng.randint(2900, 3100)}ms on pool primary",
+             "metadata": {"bench": True}} for _ in range(n)]
@@ -0,0 +1,53 @@
+import time
+from collections import deque
+import numpy as np
+
+
+class RecentIncidents:
+    """Per-service window of recently created incidents, for near-duplicate lookup.
+
+    Embeddings from create_embedding are L2-normalised, so cosine similarity is
+    a dot product. An entry expires ``window_s`` after it was last matched, so a
+    storm of identical events keeps coalescing into the same incident.
+    """
+
+    def __init__(self, window_s: float, threshold: float, max_per_service: int = 256):
+        self.window_s = window_s
+        self.threshold = threshold
+        self.max_per_service = max_per_service
+        self._by_service = {}  # service -> deque[(last_seen, labels, incident_id, created_at, vec)]
+
+    def _entries(self, service, now):
+        q = self._by_service.setdefault(service, deque(maxlen=self.max_per_service))
+        while q and now - q[0][0] > self.window_s:
+            q.popleft()
+        return q
+
+    def match(self, service: str, labels, embedding, now=None):
+        """Return (incident_id, created_at) of the most similar live incident with the same labels, or None."""
+        now = time.time() if now is None else now
+        q = self._entries(service, now)
+        key = frozenset(labels or ())
+        candidates = [e for e in q if e[1] == key]
+        if not candidates:
+            return None
+        sims = np.stack([e[4] for e in candidates]) @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        hit = candidates[best]
+        # Refresh: move to the tail with a new last-seen time
+        q.remove(hit)
+        q.append((now, hit[1], hit[2], hit[3], hit[4]))
+        return hit[2], hit[3]
+
+    def add(self, service: str, labels, embedding, incident_id: int, created_at, now=None):
+        now = time.time() if now is None else now
+        q = self._entries(service, now)
+        q.append((now, frozenset(labels or ()), incident_id, created_at, np.asarray(embedding, dtype=np.float32)))
+
+    def forget(self, service: str, incident_id: int):
+        q = self._by_service.get(service)
+        if q:
+            for e in [e for e in q if e[2] == incident_id]:
+                q.remove(e)
@@ -1,25 +1,39 @@
-import hashlib, json
+import hashlib, json, time
 from typing import List
 from redis import Redis
 import os
 from functools import lru_cache
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from config import settings
+from metrics import EMBEDDING_SECONDS
 
-# Require REDIS_URL (Upstash)
-if not getattr(settings, "REDIS_URL", None):
-    raise RuntimeError("REDIS_URL is required for embedding cache and should point to Upstash TLS URL")
-
-r = Redis.from_url(settings.REDIS_URL, decode_responses=False)
+r = None
+def _redis():
+    # Created on first use so importing this module never opens a connection
+    global r
+    if r is None:
+        # Require REDIS_URL (Upstash)
+        if not getattr(settings, "REDIS_URL", None):
+            raise RuntimeError("REDIS_URL is required for embedding cache and should point to Upstash TLS URL")
+        r = Redis.from_url(settings.REDIS_URL, decode_responses=False)
+    return r
 _model = None
 def _get_model():
     global _model
-    if _model is None: _model = SentenceTransformer(settings.HF_MODEL, device="cpu")
+    if _model is None:
+        # sentence_transformers pulls in torch; defer it until the model is actually needed
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(settings.HF_MODEL, device="cpu")
     return _model
+def warm_up():
+    """Load the model and run one throwaway encode (bypassing the cache); returns seconds taken."""
+    t0=time.perf_counter()
+    _get_model().encode(["warm-up"], normalize_embeddings=True)
+    return time.perf_counter()-t0
 def create_embedding(text: str) -> List[float]:
+    t0=time.perf_counter(); r=_redis()
     text=text.strip(); key="emb:%s:%s"%(settings.HF_MODEL, hashlib.sha256(text.encode()).hexdigest())
     c=r.get(key); 
-    if c: return json.loads(c)
+    if c:
+        vec=json.loads(c); EMBEDDING_SECONDS.labels("hit").observe(time.perf_counter()-t0); return vec
     vec = _get_model().encode([text], normalize_embeddings=True)[0].tolist()
-    r.setex(key, 86400, json.dumps(vec)); return vec
+    r.setex(key, 86400, json.dumps(vec)); EMBEDDING_SECONDS.labels("miss").observe(time.perf_counter()-t0); return vec
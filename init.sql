@@ -21,9 +21,19 @@ CREATE TABLE IF NOT EXISTS incidents (
   confidence FLOAT,
   evidence JSONB,
   status VARCHAR(50) DEFAULT 'open',
+  occurrence_count INTEGER NOT NULL DEFAULT 1,  -- near-duplicate events coalesced by the worker
+  last_seen_at TIMESTAMP,
   created_at TIMESTAMP DEFAULT NOW()
 );
 
+-- Columns added after the first release; no-ops on fresh databases
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS occurrence_count INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS incidents_event_id_idx ON incidents(event_id);
+CREATE INDEX IF NOT EXISTS incidents_created_at_idx ON incidents(created_at);
+CREATE INDEX IF NOT EXISTS raw_events_created_at_idx ON raw_events(created_at);
+
 -- vector table your vector_store.py uses
 CREATE TABLE IF NOT EXISTS memory_item (
   id            TEXT PRIMARY KEY,
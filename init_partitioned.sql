@@ -0,0 +1,100 @@
+-- Partitioned schema mode: same tables as init.sql, but raw_events and incidents
+-- are range-partitioned on created_at so old data can be detached and archived
+-- (see retention.py) instead of growing one heap forever.
+-- Use it in place of init.sql, e.g. docker build -f Dockerfile.db --build-arg SCHEMA=init_partitioned.sql .
+
+-- Enable pgvector
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- Partition granularity, 'day' or 'month'. This row is the single source of truth:
+-- ensure_partitions() and retention.py both read it. Edit the INSERT before
+-- initialising; it cannot change once partitions exist.
+CREATE TABLE IF NOT EXISTS partition_config (
+  singleton BOOLEAN PRIMARY KEY DEFAULT true CHECK (singleton),
+  step      TEXT NOT NULL CHECK (step IN ('day', 'month'))
+);
+INSERT INTO partition_config (step) VALUES ('day') ON CONFLICT DO NOTHING;
+
+-- raw_events (your worker reads from this)
+-- The partition key has to be part of the primary key.
+CREATE TABLE IF NOT EXISTS raw_events (
+  id SERIAL,
+  source TEXT,
+  type TEXT,             -- e.g., 'metric' or 'log'
+  payload TEXT,
+  metadata JSONB,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- incidents (your worker writes here)
+CREATE TABLE IF NOT EXISTS incidents (
+  id SERIAL,
+  event_id INTEGER,
+  labels TEXT[],
+  summary_text TEXT,
+  anomaly_score FLOAT,
+  confidence FLOAT,
+  evidence JSONB,
+  status VARCHAR(50) DEFAULT 'open',
+  occurrence_count INTEGER NOT NULL DEFAULT 1,  -- near-duplicate events coalesced by the worker
+  last_seen_at TIMESTAMP,
+  created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Indexes on the parent cascade to every partition
+CREATE INDEX IF NOT EXISTS raw_events_created_at_idx ON raw_events(created_at);
+CREATE INDEX IF NOT EXISTS incidents_event_id_idx ON incidents(event_id);
+CREATE INDEX IF NOT EXISTS incidents_created_at_idx ON incidents(created_at);
+
+-- Create the partitions for the current period and the next `ahead` periods, using the
+-- granularity in partition_config. Partitions are named <parent>_pYYYYMMDD (day) or
+-- <parent>_pYYYYMM (month). Bounds use the session time zone, the same one the now()/NOW()
+-- defaults are written in.
+CREATE OR REPLACE FUNCTION ensure_partitions(parent TEXT, ahead INT)
+RETURNS INT LANGUAGE plpgsql AS $$
+DECLARE
+  step TEXT := (SELECT c.step FROM partition_config c);
+  lo   TIMESTAMP;
+  hi   TIMESTAMP;
+  part TEXT;
+  made INT := 0;
+BEGIN
+  IF step IS NULL THEN
+    RAISE EXCEPTION 'partition_config has no step row';
+  END IF;
+  lo := date_trunc(step, localtimestamp);
+  FOR i IN 0..ahead LOOP
+    hi := lo + ('1 ' || step)::interval;
+    part := parent || '_p' || to_char(lo, CASE step WHEN 'day' THEN 'YYYYMMDD' ELSE 'YYYYMM' END);
+    IF to_regclass(part) IS NULL THEN
+      EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)', part, parent, lo, hi);
+      made := made + 1;
+    END IF;
+    lo := hi;
+  END LOOP;
+  RETURN made;
+END $$;
+
+-- Partitions up front (two weeks of days or two months); retention.py keeps topping this up.
+SELECT ensure_partitions(p, CASE (SELECT step FROM partition_config) WHEN 'day' THEN 14 ELSE 2 END)
+FROM unnest(ARRAY['raw_events', 'incidents']) AS p;
+
+-- vector table your vector_store.py uses
+CREATE TABLE IF NOT EXISTS memory_item (
+  id            TEXT PRIMARY KEY,
+  summary       TEXT,
+  labels        TEXT[],
+  service       TEXT,
+  incident_type TEXT,
+  model         TEXT NOT NULL DEFAULT 'sentence-transformers/all-MiniLM-L6-v2',
+  dim           INT  NOT NULL DEFAULT 384,
+  embedding     VECTOR(384)
+);
+
+-- ANN index (cosine); tune lists later
+CREATE INDEX IF NOT EXISTS memory_item_embedding_ivf
+ON memory_item USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+
+CREATE INDEX IF NOT EXISTS memory_item_service_idx ON memory_item(service);
@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+from prometheus_client import Counter, Gauge, Histogram, start_http_server, generate_latest, CONTENT_TYPE_LATEST
+
+# Buckets span sub-millisecond Redis hits up to multi-second cold model loads
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "ragent_stage_seconds", "Latency of each event pipeline stage",
+    ["stage"], buckets=_BUCKETS,
+)
+EMBEDDING_SECONDS = Histogram(
+    "ragent_embedding_seconds", "create_embedding latency split by cache result",
+    ["cache"], buckets=_BUCKETS,
+)
+EVENTS_PROCESSED = Counter(
+    "ragent_events_processed_total", "Events taken off the queue by the worker",
+    ["result"],
+)
+INCIDENTS_COALESCED = Counter(
+    "ragent_incidents_coalesced_total", "Events folded into an existing incident as an extra occurrence",
+)
+QUEUE_DEPTH = Gauge("ragent_queue_depth", "Pending events in the ingest queue", ["queue"])
+QUEUE_LAG_SECONDS = Histogram(
+    "ragent_queue_lag_seconds", "Time between API enqueue and worker dequeue",
+    buckets=_BUCKETS + (60.0, 300.0),
+)
+READY = Gauge("ragent_ready", "1 once warm-up has finished and dependencies answered")
+WARMUP_SECONDS = Gauge("ragent_warmup_seconds", "Duration of the startup warm-up phase")
+
+# Workers that finished warm-up heartbeat into this sorted set (member <host>:<pid>,
+# score = unix time); the API's /health/ready counts members newer than the TTL.
+WORKER_READY_KEY = "worker_ready"
+WORKER_READY_TTL = 30
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the wall time of the enclosed block under ``stage``."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+
+def start_metrics_server(port: int):
+    """Expose /metrics on a background HTTP server (used by the worker)."""
+    start_http_server(port)
+
+
+def render_latest():
+    """Return (body, content_type) for an HTTP /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,243 @@
+"""Partition maintenance for the partitioned schema (init_partitioned.sql).
+
+Run periodically (cron / scheduled job):
+
+    python retention.py --ahead 14 --keep "30 days" --export-dir /archive --format ndjson
+
+1. Creates upcoming partitions of raw_events and incidents via ensure_partitions(),
+   at the granularity stored in partition_config.
+2. For each partition whose upper bound is older than --keep: detaches it
+   CONCURRENTLY (inserts into the live partitions are not blocked), streams it
+   to a compressed NDJSON (.ndjson.gz) or Parquet file, drops the matching
+   memory_item vectors for archived incidents and then drops the table.
+
+Partitions left behind by an interrupted run are picked up again. These are
+partitions still "detach pending" (finished with DETACH ... FINALIZE) and
+<table>_p* tables that were detached but never exported. Tables kept by
+--no-drop are marked with an "archived:" comment so they are not exported twice.
+"""
+import argparse
+import gzip
+import json
+import logging
+import os
+import tempfile
+import psycopg
+from psycopg import sql
+from config import settings
+
+log = logging.getLogger(__name__)
+
+TABLES = ("raw_events", "incidents")
+BATCH_ROWS = 50_000
+
+ARCHIVED_COMMENT = "archived:"
+
+# Attached partitions whose TO (...) bound is older than now() - keep, plus any left
+# "detach pending" by an interrupted DETACH ... CONCURRENTLY
+_EXPIRED_SQL = r"""
+    SELECT c.relname, CASE WHEN i.inhdetachpending THEN 'pending' ELSE 'attached' END
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s::regclass
+      AND (i.inhdetachpending
+           OR substring(pg_get_expr(c.relpartbound, c.oid) from 'TO \(''([^'']+)''\)')::timestamptz
+              <= now() - %s::interval)
+    ORDER BY c.relname
+"""
+
+# <table>_pNNNN tables no longer attached to anything and not yet exported
+_ORPHANED_SQL = r"""
+    SELECT c.relname, 'detached'
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r' AND n.nspname = current_schema()
+      AND c.relname ~ ('^' || %s || '_p[0-9]+$')
+      AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+      AND coalesce(obj_description(c.oid, 'pg_class'), '') NOT LIKE %s
+    ORDER BY c.relname
+"""
+
+
+def is_partitioned(conn, table: str) -> bool:
+    row = conn.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,)).fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def partition_step(conn) -> str:
+    """The granularity ('day' or 'month') the schema was initialised with."""
+    return conn.execute("SELECT step FROM partition_config").fetchone()[0]
+
+
+def ensure_partitions(conn, ahead: int):
+    for table in TABLES:
+        made = conn.execute("SELECT ensure_partitions(%s, %s)", (table, ahead)).fetchone()[0]
+        if made:
+            log.info("Created %d new partition(s) of %s", made, table)
+
+
+def default_ahead(step: str) -> int:
+    return 14 if step == "day" else 2
+
+
+def top_up_partitions() -> bool:
+    """Cheap ensure_partitions() for the API/worker processes, so ingest keeps a partition to
+    write into even if the retention job stops running. Returns False on an unpartitioned schema."""
+    with psycopg.connect(settings.DATABASE_URL, connect_timeout=3) as conn:
+        if not is_partitioned(conn, "raw_events"):
+            return False
+        ensure_partitions(conn, default_ahead(partition_step(conn)))
+        conn.commit()
+    return True
+
+
+def expired_partitions(conn, table: str, keep: str) -> list[tuple[str, str]]:
+    """Return (partition, state) pairs to archive; state is 'attached', 'pending' or 'detached'."""
+    orphaned = conn.execute(_ORPHANED_SQL, (table, ARCHIVED_COMMENT + "%")).fetchall()
+    return orphaned + conn.execute(_EXPIRED_SQL, (table, keep)).fetchall()
+
+
+def _preflight(export_dir: str, fmt: str):
+    """Fail before anything is detached if the export cannot possibly succeed."""
+    if fmt == "parquet":
+        try:
+            import pyarrow, pyarrow.parquet  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("--format parquet requires pyarrow (pip install pyarrow)") from e
+    os.makedirs(export_dir, exist_ok=True)
+    with tempfile.TemporaryFile(dir=export_dir):
+        pass  # raises if the directory is not writable
+
+
+def _export_ndjson(conn, part: str, path: str) -> int:
+    """Bulk-stream the partition with COPY; one JSON object per line."""
+    rows = 0
+    with gzip.open(path, "wb") as out, conn.cursor() as cur:
+        with cur.copy(sql.SQL("COPY (SELECT row_to_json(t) FROM {} t) TO STDOUT").format(
+                sql.Identifier(part))) as copy:
+            for (line,) in copy.rows():  # rows() undoes COPY's text escaping
+                out.write(line.encode() + b"\n")
+                rows += 1
+    return rows
+
+
+def _arrow_type(pa, pg_type: str):
+    if pg_type.endswith("[]"): return pa.list_(pa.string())
+    if pg_type in ("integer", "bigint", "smallint"): return pa.int64()
+    if pg_type in ("double precision", "real") or pg_type.startswith("numeric"): return pa.float64()
+    if pg_type == "boolean": return pa.bool_()
+    if pg_type == "timestamp with time zone": return pa.timestamp("us", tz="UTC")
+    if pg_type == "timestamp without time zone": return pa.timestamp("us")
+    return pa.string()  # text, varchar, json/jsonb (serialised) and anything else
+
+
+def _export_parquet(conn, part: str, path: str) -> int:
+    """Stream the partition through a server-side cursor into zstd-compressed Parquet."""
+    import pyarrow as pa  # availability checked in _preflight
+    import pyarrow.parquet as pq
+    cols = conn.execute("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """, (part,)).fetchall()
+    schema = pa.schema([(name, _arrow_type(pa, t)) for name, t in cols])
+    json_cols = {name for name, t in cols if t in ("json", "jsonb")}
+    rows = 0
+    with conn.cursor(name=f"export_{part}") as cur, pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        cur.execute(sql.SQL("SELECT * FROM {}").format(sql.Identifier(part)))
+        while True:
+            batch = cur.fetchmany(BATCH_ROWS)
+            if not batch: break
+            data = {name: [r[i] for r in batch] for i, (name, _) in enumerate(cols)}
+            for name in json_cols:
+                data[name] = [None if v is None else json.dumps(v, default=str) for v in data[name]]
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            rows += len(batch)
+    return rows
+
+
+def archive_partition(table: str, part: str, export_dir: str, fmt: str, drop: bool = True,
+                      state: str = "attached") -> str:
+    """Detach ``part`` from ``table``, export it to ``export_dir`` and (optionally) drop it.
+
+    ``state`` comes from expired_partitions(); 'pending' and 'detached' resume an earlier run.
+    """
+    ident = sql.Identifier
+    if state != "detached":
+        # DETACH ... CONCURRENTLY cannot run inside a transaction block. If it is interrupted the
+        # partition stays "detach pending" and the next run finishes it with FINALIZE.
+        how = "FINALIZE" if state == "pending" else "CONCURRENTLY"
+        with psycopg.connect(settings.DATABASE_URL, autocommit=True) as conn:
+            conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {} " + how).format(ident(table), ident(part)))
+            log.info("Detached %s from %s", part, table)
+
+    ext = "ndjson.gz" if fmt == "ndjson" else "parquet"
+    path = os.path.join(export_dir, f"{part}.{ext}")
+    tmp = path + ".tmp"
+    with psycopg.connect(settings.DATABASE_URL) as conn:
+        try:
+            rows = (_export_ndjson if fmt == "ndjson" else _export_parquet)(conn, part, tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+        log.info("Exported %d rows of %s to %s", rows, part, path)
+        if drop:
+            if table == "incidents":
+                # The ANN index should not keep returning incidents that have been archived
+                cur = conn.execute(sql.SQL(
+                    "DELETE FROM memory_item WHERE id IN (SELECT id::text FROM {})").format(ident(part)))
+                log.info("Removed %d memory_item vectors for %s", cur.rowcount, part)
+            conn.execute(sql.SQL("DROP TABLE {}").format(ident(part)))
+            log.info("Dropped %s", part)
+        else:
+            # Keeps later runs from treating the kept table as an unexported orphan
+            conn.execute(sql.SQL("COMMENT ON TABLE {} IS {}").format(ident(part), sql.Literal(ARCHIVED_COMMENT + path)))
+        conn.commit()
+    return path
+
+
+def run(step, ahead, keep: str, export_dir: str, fmt: str, drop: bool = True, dry_run: bool = False):
+    """``step`` is only checked against partition_config; ``ahead=None`` means 14 days / 2 months."""
+    _preflight(export_dir, fmt)
+    with psycopg.connect(settings.DATABASE_URL) as conn:
+        missing = [t for t in TABLES if not is_partitioned(conn, t)]
+        if missing:
+            raise RuntimeError(f"{', '.join(missing)} not partitioned; initialise the database with init_partitioned.sql")
+        configured = partition_step(conn)
+        if step and step != configured:
+            raise RuntimeError(f"--step {step} does not match the schema's partition_config step '{configured}'")
+        if ahead is None:
+            ahead = default_ahead(configured)
+        ensure_partitions(conn, ahead)
+        conn.commit()
+        expired = {t: expired_partitions(conn, t, keep) for t in TABLES}
+
+    archived = []
+    for table, parts in expired.items():
+        for part, state in parts:
+            if dry_run:
+                log.info("Would archive %s (%s, %s)", part, table, state)
+                continue
+            archived.append(archive_partition(table, part, export_dir, fmt, drop=drop, state=state))
+    return archived
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Create upcoming partitions and archive expired ones")
+    ap.add_argument("--step", choices=["day", "month"],
+                    help="expected granularity; refused unless it matches partition_config")
+    ap.add_argument("--ahead", type=int, help="future partitions to keep pre-created (default 14 days / 2 months)")
+    ap.add_argument("--keep", default="30 days", help="retention as a Postgres interval, e.g. '30 days', '6 months'")
+    ap.add_argument("--export-dir", default=os.environ.get("ARCHIVE_DIR", "archive"))
+    ap.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    ap.add_argument("--no-drop", action="store_true",
+                    help="leave detached partitions in place after export (marked so they are not re-exported)")
+    ap.add_argument("--dry-run", action="store_true", help="only create partitions and list what would be archived")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    run(args.step, args.ahead, args.keep, args.export_dir, args.format, drop=not args.no_drop, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
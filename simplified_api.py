@@ -1,13 +1,27 @@
 # simplified_api.py - Just event ingestion, no search
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from typing import Dict, Any
+import asyncio
+import logging
+import os
 import psycopg
 import redis
 import json
+import time
 from pydantic import BaseModel
 from config import settings
+from retention import top_up_partitions
+from metrics import timed, render_latest, READY, WARMUP_SECONDS, WORKER_READY_KEY, WORKER_READY_TTL
 
-app = FastAPI(title="Event Processor API")
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(warm_up)
+    yield
+
+app = FastAPI(title="Event Processor API", lifespan=lifespan)
+log = logging.getLogger(__name__)
 
 # Data model for incoming events
 class EventData(BaseModel):
@@ -16,24 +30,75 @@ class EventData(BaseModel):
     payload: str
     metadata: Dict[str, Any] = {}
 
-# Redis connection for queuing - require REDIS_URL (Upstash)
-if not getattr(settings, "REDIS_URL", None):
-    raise RuntimeError("REDIS_URL is required and should point to an Upstash TLS URL (rediss://...)")
-redis_client = redis.Redis.from_url(settings.REDIS_URL)
+# Redis connection for queuing, created on first use
+redis_client = None
+def get_redis():
+    global redis_client
+    if redis_client is None:
+        # Require REDIS_URL (Upstash)
+        if not getattr(settings, "REDIS_URL", None):
+            raise RuntimeError("REDIS_URL is required and should point to an Upstash TLS URL (rediss://...)")
+        # Bounded connect so an unreachable Redis cannot hang startup or the readiness probe
+        redis_client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=3)
+    return redis_client
+
+# Filled in once warm-up succeeds; /health/ready reports not-ready until then
+warmup = {"done": False, "seconds": None}
+
+# Whether /health/ready also waits for a warmed-up worker. Off by default because the
+# default deployment (RUN_MODE=api) runs no worker; the worker check is reported either way.
+READY_REQUIRES_WORKER = os.environ.get("READY_REQUIRES_WORKER", "").lower() in ("1", "true", "yes")
+
+def _dependency_checks():
+    """Ping Redis and Postgres and look for a warmed-up worker; returns {name: "ok" | error string}"""
+    checks = {}
+    try:
+        r = get_redis()
+        r.ping()
+        checks["redis"] = "ok"
+        # worker.py heartbeats into this set only after the model preload + dummy encode
+        live = r.zcount(WORKER_READY_KEY, time.time() - WORKER_READY_TTL, "+inf")
+        checks["worker"] = "ok" if live else "error: no worker has finished warm-up"
+    except Exception as e:
+        checks["redis"] = f"error: {e}"
+        checks["worker"] = "unknown"
+    try:
+        with psycopg.connect(settings.DATABASE_URL, connect_timeout=3) as conn:
+            conn.execute("SELECT 1")
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"error: {e}"
+    return checks
+
+def warm_up():
+    """Open the Redis pool and a first DB connection; marks warm-up done only if both answer"""
+    t0 = time.perf_counter()
+    checks = _dependency_checks()
+    if checks["redis"] == "ok" and checks["database"] == "ok":
+        warmup["seconds"] = round(time.perf_counter() - t0, 4)
+        warmup["done"] = True
+        WARMUP_SECONDS.set(warmup["seconds"])
+        READY.set(1)
+        try:
+            # Partitioned schema only: make sure /events has partitions to insert into
+            top_up_partitions()
+        except Exception:
+            log.exception("Partition top-up failed")
+    return checks
 
 @app.post("/events")
 def receive_event(event: EventData):
     """Receive events and queue them for processing - that's it!"""
     try:
         # 1. Store in raw_events table
-        with psycopg.connect(settings.DATABASE_URL) as conn:
+        with timed("api_event_insert"), psycopg.connect(settings.DATABASE_URL) as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     INSERT INTO raw_events (source, type, payload, metadata)
                     VALUES (%s, %s, %s, %s)
-                    RETURNING id
+                    RETURNING id, created_at
                 """, (event.source, event.type, event.payload, json.dumps(event.metadata)))
-                event_id = cur.fetchone()[0]
+                event_id, created_at = cur.fetchone()
                 conn.commit()
         
         # 2. Queue for processing
@@ -42,10 +107,13 @@ def receive_event(event: EventData):
             "source": event.source,
             "type": event.type,
             "payload": event.payload,
-            "metadata": event.metadata
+            "metadata": event.metadata,
+            "created_at": created_at.isoformat(),  # lets the worker prune partitions on fetch
+            "enqueued_at": time.time(),  # lets the worker report queue lag
         }
         
-        redis_client.lpush(settings.QUEUE_NAME, json.dumps(queue_data))
+        with timed("api_enqueue"):
+            get_redis().lpush(settings.QUEUE_NAME, json.dumps(queue_data))
         
         return {
             "status": "success",
@@ -61,6 +129,27 @@ def health_check():
     """Simple health check"""
     return {"status": "healthy", "service": "event-processor"}
 
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: API warm-up done, Redis/Postgres answer (and a warmed-up worker, if required)"""
+    # Retries warm-up here if the dependencies were down at startup
+    checks = _dependency_checks() if warmup["done"] else warm_up()
+    gating = [k for k in checks if k != "worker" or READY_REQUIRES_WORKER]
+    ready = warmup["done"] and all(checks[k] == "ok" for k in gating)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "service": "event-processor",
+        "warmup_seconds": warmup["seconds"],
+        "checks": checks,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/agent/notifications")
 def get_agent_notifications(limit: int = 10):
     """Get notifications for the Agent about ready incidents"""
@@ -68,7 +157,7 @@ def get_agent_notifications(limit: int = 10):
         notifications = []
         
         for _ in range(limit):
-            result = redis_client.rpop("agent_notifications")
+            result = get_redis().rpop("agent_notifications")
             if not result:
                 break
             
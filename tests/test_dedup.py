@@ -0,0 +1,83 @@
+import math
+
+from dedup import RecentIncidents
+
+E1 = [1.0, 0.0, 0.0]
+E2 = [0.0, 1.0, 0.0]
+E3 = [0.0, 0.0, 1.0]
+
+
+def make(window_s=10, threshold=0.5, max_per_service=256):
+    return RecentIncidents(window_s=window_s, threshold=threshold, max_per_service=max_per_service)
+
+
+def test_similarity_at_threshold_matches_and_below_does_not():
+    idx = make(threshold=0.5)
+    idx.add("api", ["x"], E1, incident_id=1, created_at="t1", now=0)
+    # cos = 0.5 exactly (representable in float32)
+    assert idx.match("api", ["x"], [0.5, math.sqrt(0.75), 0.0], now=1) == (1, "t1")
+    assert idx.match("api", ["x"], [0.499, math.sqrt(1 - 0.499 ** 2), 0.0], now=1) is None
+
+
+def test_picks_most_similar_candidate():
+    idx = make(threshold=0.5)
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    idx.add("api", [], E2, incident_id=2, created_at="t2", now=0)
+    assert idx.match("api", [], [0.6, 0.8, 0.0], now=1) == (2, "t2")
+
+
+def test_labels_and_service_must_match():
+    idx = make()
+    idx.add("api", ["SQLi:UNION SELECT", "XSS:<script>"], E1, incident_id=1, created_at="t1", now=0)
+    assert idx.match("api", ["SQLi:UNION SELECT"], E1, now=1) is None
+    assert idx.match("db", ["SQLi:UNION SELECT", "XSS:<script>"], E1, now=1) is None
+    # label order does not matter
+    assert idx.match("api", ["XSS:<script>", "SQLi:UNION SELECT"], E1, now=1) == (1, "t1")
+
+
+def test_entries_expire_after_window():
+    idx = make(window_s=10)
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    assert idx.match("api", [], E1, now=10) == (1, "t1")  # refreshed to 10
+    assert idx.match("api", [], E1, now=20.5) is None
+
+
+def test_match_refreshes_entry_and_keeps_deque_ordered():
+    idx = make(window_s=10)
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    idx.add("api", [], E2, incident_id=2, created_at="t2", now=5)
+    assert idx.match("api", [], E1, now=8) == (1, "t1")
+    # Expiry pops from the oldest end, so incident 2 (last seen at 5) only expires at 16 if the
+    # refreshed incident 1 (last seen at 8) was moved behind it
+    assert idx.match("api", [], E2, now=16) is None
+    assert idx.match("api", [], E1, now=16) == (1, "t1")
+
+
+def test_max_per_service_evicts_oldest():
+    idx = make(max_per_service=2)
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    idx.add("api", [], E2, incident_id=2, created_at="t2", now=1)
+    idx.add("api", [], E3, incident_id=3, created_at="t3", now=2)
+    assert idx.match("api", [], E1, now=3) is None
+    assert idx.match("api", [], E2, now=3) == (2, "t2")
+    assert idx.match("api", [], E3, now=3) == (3, "t3")
+
+
+def test_forget_removes_only_that_incident():
+    idx = make()
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    idx.add("api", [], E2, incident_id=2, created_at="t2", now=0)
+    idx.forget("api", 1)
+    idx.forget("unknown-service", 1)  # no-op
+    assert idx.match("api", [], E1, now=1) is None
+    assert idx.match("api", [], E2, now=1) == (2, "t2")
+
+
+def test_refreshed_entry_survives_max_per_service_eviction():
+    idx = make(max_per_service=2)
+    idx.add("api", [], E1, incident_id=1, created_at="t1", now=0)
+    idx.add("api", [], E2, incident_id=2, created_at="t2", now=1)
+    assert idx.match("api", [], E1, now=2) == (1, "t1")
+    idx.add("api", [], E3, incident_id=3, created_at="t3", now=3)
+    assert idx.match("api", [], E2, now=4) is None
+    assert idx.match("api", [], E1, now=4) == (1, "t1")
@@ -1,23 +1,26 @@
+import logging
 import psycopg
 from config import settings
 
+log = logging.getLogger(__name__)
+
 def test_vector_connection():
     """Simple test to verify database connection and vector extension"""
     try:
-        print("=== VECTOR CONNECTION TEST ===")
+        log.info("=== VECTOR CONNECTION TEST ===")
         with psycopg.connect(settings.DATABASE_URL) as conn:
             with conn.cursor() as cur:
                 # Test basic connection
                 cur.execute("SELECT 1")
-                print("✓ Database connection works")
+                log.info("✓ Database connection works")
                 
                 # Test pgvector extension
                 cur.execute("SELECT extname FROM pg_extension WHERE extname = 'vector'")
                 ext = cur.fetchone()
                 if ext:
-                    print("✓ pgvector extension is installed")
+                    log.info("✓ pgvector extension is installed")
                 else:
-                    print("✗ pgvector extension NOT found")
+                    log.warning("✗ pgvector extension NOT found")
                     return False
                 
                 # Test table exists
@@ -30,9 +33,9 @@ def test_vector_connection():
                 """)
                 table_exists = cur.fetchone()[0]
                 if table_exists:
-                    print("✓ memory_item table exists")
+                    log.info("✓ memory_item table exists")
                 else:
-                    print("✗ memory_item table NOT found")
+                    log.warning("✗ memory_item table NOT found")
                     return False
                 
                 # Test embedding column
@@ -44,38 +47,36 @@ def test_vector_connection():
                 """)
                 col_info = cur.fetchone()
                 if col_info:
-                    print(f"✓ embedding column exists: {col_info[1]}")
+                    log.info("✓ embedding column exists: %s", col_info[1])
                 else:
-                    print("✗ embedding column NOT found")
+                    log.warning("✗ embedding column NOT found")
                     return False
                 
                 # Count total rows
                 cur.execute("SELECT COUNT(*) FROM public.memory_item")
                 total = cur.fetchone()[0]
-                print(f"✓ Total rows: {total}")
+                log.info("✓ Total rows: %s", total)
                 
                 # Count rows with embeddings
                 cur.execute("SELECT COUNT(*) FROM public.memory_item WHERE embedding IS NOT NULL")
                 with_embeddings = cur.fetchone()[0]
-                print(f"✓ Rows with embeddings: {with_embeddings}")
+                log.info("✓ Rows with embeddings: %s", with_embeddings)
                 
                 if with_embeddings > 0:
                     # Check embedding dimension
                     cur.execute("SELECT array_length(embedding, 1) FROM public.memory_item WHERE embedding IS NOT NULL LIMIT 1")
                     dim = cur.fetchone()[0]
-                    print(f"✓ Embedding dimension: {dim}")
+                    log.info("✓ Embedding dimension: %s", dim)
                     
                     # Test simple vector operation
                     cur.execute("SELECT embedding <-> embedding FROM public.memory_item WHERE embedding IS NOT NULL LIMIT 1")
                     distance = cur.fetchone()[0]
-                    print(f"✓ Vector distance operation works: {distance}")
+                    log.info("✓ Vector distance operation works: %s", distance)
                 
                 return True
                 
-    except Exception as e:
-        print(f"✗ Error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Vector connection test failed")
         return False
 
 def _vec_literal(vec):
@@ -88,11 +89,11 @@ def search_similar_incidents(embedding, filters=None, k=5):
     Deterministic pgvector search using string literal for vector.
     """
     try:
-        print(f"DEBUG: search_similar_incidents called with k={k}")
+        log.debug("search_similar_incidents called with k=%s", k)
         
         # Convert embedding to vector string using our working function
         vstr = _vec_literal(embedding)
-        print(f"DEBUG: Vector string created, length: {len(vstr)}")
+        log.debug("Vector string created, length: %s", len(vstr))
         
         where_sql = ""
         params = []
@@ -101,9 +102,9 @@ def search_similar_incidents(embedding, filters=None, k=5):
             where_sql = "WHERE service = %s"
             params.append(filters["service"])
 
-        print(f"DEBUG: Attempting database connection...")
+        log.debug("Attempting database connection...")
         with psycopg.connect(settings.DATABASE_URL) as conn:
-            print(f"DEBUG: Database connected successfully")
+            log.debug("Database connected successfully")
             with conn.cursor() as cur:
                 # Get existing columns
                 cur.execute("""
@@ -113,21 +114,21 @@ def search_similar_incidents(embedding, filters=None, k=5):
                     ORDER BY ordinal_position
                 """)
                 columns = [row[0] for row in cur.fetchall()]
-                print(f"DEBUG: Available columns: {columns}")
+                log.debug("Available columns: %s", columns)
                 
                 # Check if table has data
                 cur.execute("SELECT COUNT(*) FROM public.memory_item")
                 total_count = cur.fetchone()[0]
-                print(f"DEBUG: Total rows in memory_item: {total_count}")
+                log.debug("Total rows in memory_item: %s", total_count)
                 
                 if total_count == 0:
-                    print("DEBUG: Table is empty!")
+                    log.debug("Table is empty!")
                     return []
                 
                 # Use columns that exist
                 existing_columns = [col for col in ['id', 'summary', 'labels', 'service', 'incident_type'] if col in columns]
                 col_list = ', '.join(existing_columns)
-                print(f"DEBUG: Will select columns: {existing_columns}")
+                log.debug("Will select columns: %s", existing_columns)
                 
                 # Build SQL - use the working approach without ORDER BY in main query
                 sql = f"""
@@ -140,16 +141,16 @@ def search_similar_incidents(embedding, filters=None, k=5):
                 # Only parameterize non-vector parameters
                 query_params = params + [k]
                 
-                print(f"DEBUG: Executing SQL with {len(query_params)} params")
+                log.debug("Executing SQL with %s params", len(query_params))
                 cur.execute(sql, query_params)
                 rows = cur.fetchall()
                 
-                print(f"DEBUG: Query returned {len(rows)} rows")
+                log.debug("Query returned %s rows", len(rows))
                 
                 # Sort results by distance in Python (since ORDER BY was causing issues)
                 if rows:
                     rows = sorted(rows, key=lambda x: x[-1])  # Sort by distance (last column)
-                    print(f"DEBUG: First result distance: {rows[0][-1]}")
+                    log.debug("First result distance: %s", rows[0][-1])
                 
                 # Return results with proper column mapping
                 results = []
@@ -168,20 +169,18 @@ def search_similar_incidents(embedding, filters=None, k=5):
                         result['type'] = result.pop('incident_type')
                     results.append(result)
                 
-                print(f"DEBUG: Returning {len(results)} results")
+                log.debug("Returning %s results", len(results))
                 return results
                 
-    except Exception as e:
-        print(f"ERROR in vector search: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error in vector search")
         return []
 
 
 def index_incident(incident_data, embedding):
     """Index an incident into the vector store"""
     try:
-        print(f"DEBUG: Indexing incident {incident_data['id']}")
+        log.debug("Indexing incident %s", incident_data['id'])
         with psycopg.connect(settings.DATABASE_URL) as conn:
             with conn.cursor() as cur:
                 # Insert or update the incident in memory_item
@@ -203,10 +202,8 @@ def index_incident(incident_data, embedding):
                     embedding
                 ))
                 conn.commit()
-                print(f"Indexed incident {incident_data['id']} into vector store")
-    except Exception as e:
-        print(f"Error indexing incident: {e}")
-        import traceback
-        traceback.print_exc()
+                log.debug("Indexed incident %s into vector store", incident_data['id'])
+    except Exception:
+        log.exception("Error indexing incident")
 
 
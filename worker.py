@@ -1,6 +1,9 @@
 import json
+import logging
+import os
 import time
 import re
+import socket
 import redis
 import psycopg
 import urllib.request
@@ -8,104 +11,37 @@ import urllib.error
 from config import settings
 from classifier import classify
 from anomaly import anomaly_score
-from embedder import create_embedding
+from embedder import create_embedding, warm_up as warm_up_embedder
 from vector_store import index_incident
+from dedup import RecentIncidents
+from retention import top_up_partitions
+from metrics import (timed, start_metrics_server, EVENTS_PROCESSED, INCIDENTS_COALESCED, QUEUE_DEPTH,
+                     QUEUE_LAG_SECONDS, READY, WARMUP_SECONDS, WORKER_READY_KEY, WORKER_READY_TTL)
 
-def process_event(event_id: int):
-    """Process a single event from the queue"""
-    try:
-        with psycopg.connect(settings.DATABASE_URL) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT * FROM raw_events WHERE id = %s", (event_id,))
-                row = cur.fetchone()
-                if not row:
-                    print(f"Event {event_id} not found in database")
-                    return
-
-                # row: [id, source, type, payload, metadata, created_at]
-                raw_metadata = row[4]
-                if raw_metadata is None:
-                    metadata = {}
-                elif isinstance(raw_metadata, str):
-                    metadata = json.loads(raw_metadata)
-                else:
-                    metadata = raw_metadata  # already a dict (JSONB)
-
-                payload_str = row[3] or ""  # <-- define it once, guard NULL
-
-                event_data = {
-                    "id": row[0],
-                    "source": row[1],
-                    "type": row[2],
-                    "payload": payload_str,
-                    "metadata": metadata,
-                    "created_at": row[5],
-                }
-
-                print(f"Processing event {event_id}: {payload_str[:50]}...")
+log = logging.getLogger(__name__)
 
-                # Classify
-                classification = classify(payload_str)
-
-                # Anomaly (if metric + "latency" present)
-                anomaly = None
-                if event_data["type"] == "metric" and "latency" in payload_str:
-                    m = re.search(r"(\d+)\s*ms", payload_str)
-                    if m:
-                        latency_ms = int(m.group(1))
-                        anomaly = anomaly_score(
-                            service=event_data["source"],
-                            metric="latency",
-                            value=latency_ms,
-                        )
-
-                # Summary + embedding
-                summary = f"{event_data['source']} {event_data['type']}: {payload_str[:100]}"
-                embedding = create_embedding(summary)
-
-                # Persist incident
-                cur.execute(
-                    """
-                    INSERT INTO incidents (event_id, labels, summary_text, anomaly_score, confidence, evidence)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                    """,
-                    (
-                        event_id,
-                        classification.get("labels", []),
-                        summary,
-                        anomaly,
-                        classification.get("confidence", 0.0),
-                        json.dumps(classification.get("evidence", [])),
-                    ),
-                )
-                incident_id = cur.fetchone()[0]
-                conn.commit()
+# How often (seconds) the worker samples LLEN for the queue-depth gauge
+QUEUE_DEPTH_INTERVAL = 5.0
 
-                # Index into pgvector
-                index_incident(
-                    {
-                        "id": incident_id,
-                        "summary": summary,
-                        "labels": classification.get("labels", []),
-                        "service": event_data["source"],
-                        "type": event_data.get("type", ""),
-                        "timestamp": str(event_data["created_at"]),
-                    },
-                    embedding,
-                )
-
-                print(f"Created incident {incident_id} for event {event_id}")
+# How often (seconds) the worker tops up raw_events/incidents partitions (partitioned schema only)
+PARTITION_TOPUP_INTERVAL = 3600.0
 
-                # 🚀 NEW: Publish notification to Redis for Agent
-                return incident_id  # Return incident_id so we can notify about it
+# This worker's member in the WORKER_READY_KEY heartbeat set; refreshed with the queue-depth sample
+READY_MEMBER = f"{socket.gethostname()}:{os.getpid()}"
 
-    except Exception as e:
-        print(f"Error processing event {event_id}: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+# Near-duplicate coalescing: an event whose summary embedding is at least DEDUP_THRESHOLD
+# cosine-similar to an incident of the same service and labels seen within the last
+# DEDUP_WINDOW_S seconds bumps that incident's occurrence_count instead of creating a new one.
+# DEDUP_WINDOW_S=0 disables it.
+_dedup_window = float(os.environ.get("DEDUP_WINDOW_S", 300))
+recent_incidents = RecentIncidents(
+    window_s=_dedup_window,
+    threshold=float(os.environ.get("DEDUP_THRESHOLD", 0.95)),
+    max_per_service=int(os.environ.get("DEDUP_MAX_PER_SERVICE", 256)),
+) if _dedup_window > 0 else None
 
+# Latency spikes at or above this |z| always get their own incident
+ANOMALY_Z_ALERT = 3.0
 
 def publish_incident_notification(redis_client, incident_id: int, event_data: dict):
     """Publish notification that a new incident is ready for Agent to handle"""
@@ -121,11 +57,11 @@ def publish_incident_notification(redis_client, incident_id: int, event_data: di
         
         # Publish to a notification channel/queue
         redis_client.lpush("agent_notifications", json.dumps(notification))
-        print(f"📢 Published notification for incident {incident_id} to agent_notifications queue")
+        log.debug("Published notification for incident %s to agent_notifications queue", incident_id)
         
         # Optional: Also publish to a Redis channel for real-time notifications
         redis_client.publish("incident_alerts", json.dumps(notification))
-        print(f"📡 Published real-time alert for incident {incident_id}")
+        log.debug("Published real-time alert for incident %s", incident_id)
         # If Upstash REST config is present, also LPUSH via the REST API so external agents
         # that only read Upstash can see new ids.
         if getattr(settings, 'UPSTASH_REDIS_REST_URL', '') and getattr(settings, 'UPSTASH_REDIS_REST_TOKEN', ''):
@@ -137,23 +73,29 @@ def publish_incident_notification(redis_client, incident_id: int, event_data: di
                 req.add_header('Content-Type', 'application/json')
                 with urllib.request.urlopen(req, timeout=5) as resp:
                     resp.read()
-                print(f"🔁 Also pushed notification to Upstash REST for incident {incident_id}")
+                log.debug("Also pushed notification to Upstash REST for incident %s", incident_id)
             except urllib.error.URLError as e:
-                print(f"Failed to push to Upstash REST: {e}")
+                log.warning("Failed to push to Upstash REST: %s", e)
         
-    except Exception as e:
-        print(f"Error publishing notification: {e}")
+    except Exception:
+        log.exception("Error publishing notification")
 
 
-def process_event(event_id: int, redis_client=None):
+def process_event(event_id: int, redis_client=None, created_at=None):
     """Process a single event from the queue"""
     try:
         with psycopg.connect(settings.DATABASE_URL) as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT * FROM raw_events WHERE id = %s", (event_id,))
-                row = cur.fetchone()
+                with timed("db_fetch"):
+                    if created_at:
+                        # Exact created_at lets a partitioned raw_events skip every other partition
+                        cur.execute("SELECT * FROM raw_events WHERE id = %s AND created_at = %s::timestamptz",
+                                    (event_id, created_at))
+                    else:
+                        cur.execute("SELECT * FROM raw_events WHERE id = %s", (event_id,))
+                    row = cur.fetchone()
                 if not row:
-                    print(f"Event {event_id} not found in database")
+                    log.warning("Event %s not found in database", event_id)
                     return None
 
                 # row: [id, source, type, payload, metadata, created_at]
@@ -176,10 +118,11 @@ def process_event(event_id: int, redis_client=None):
                     "created_at": row[5],
                 }
 
-                print(f"Processing event {event_id}: {payload_str[:50]}...")
+                log.debug("Processing event %s: %.50s...", event_id, payload_str)
 
                 # Classify
-                classification = classify(payload_str)
+                with timed("classify"):
+                    classification = classify(payload_str)
 
                 # Anomaly (if metric + "latency" present)
                 anomaly = None
@@ -187,83 +130,158 @@ def process_event(event_id: int, redis_client=None):
                     m = re.search(r"(\d+)\s*ms", payload_str)
                     if m:
                         latency_ms = int(m.group(1))
-                        anomaly = anomaly_score(
-                            service=event_data["source"],
-                            metric="latency",
-                            value=latency_ms,
-                        )
+                        with timed("anomaly_score"):
+                            anomaly = anomaly_score(
+                                service=event_data["source"],
+                                metric="latency",
+                                value=latency_ms,
+                            )
 
                 # Summary + embedding
                 summary = f"{event_data['source']} {event_data['type']}: {payload_str[:100]}"
-                embedding = create_embedding(summary)
+                with timed("create_embedding"):
+                    embedding = create_embedding(summary)
+
+                # Coalesce near-duplicates into an existing incident
+                service = event_data["source"]
+                labels = classification.get("labels", [])
+                is_spike = anomaly is not None and abs(anomaly) >= ANOMALY_Z_ALERT
+                if recent_incidents and not is_spike:
+                    with timed("dedup"):
+                        hit = recent_incidents.match(service, labels, embedding)
+                        if hit:
+                            cur.execute(
+                                """
+                                UPDATE incidents
+                                SET occurrence_count = occurrence_count + 1, last_seen_at = NOW()
+                                WHERE id = %s AND created_at = %s AND status = 'open'
+                                """,
+                                hit,
+                            )
+                            conn.commit()
+                    if hit and cur.rowcount:
+                        INCIDENTS_COALESCED.inc()
+                        log.debug("Coalesced event %s into incident %s", event_id, hit[0])
+                        return hit[0]
+                    if hit:
+                        # Incident was resolved/closed or archived; stop matching it and open a fresh one
+                        recent_incidents.forget(service, hit[0])
 
                 # Persist incident
-                cur.execute(
-                    """
-                    INSERT INTO incidents (event_id, labels, summary_text, anomaly_score, confidence, evidence)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                    """,
-                    (
-                        event_id,
-                        classification.get("labels", []),
-                        summary,
-                        anomaly,
-                        classification.get("confidence", 0.0),
-                        json.dumps(classification.get("evidence", [])),
-                    ),
-                )
-                incident_id = cur.fetchone()[0]
-                conn.commit()
+                with timed("incident_insert"):
+                    cur.execute(
+                        """
+                        INSERT INTO incidents (event_id, labels, summary_text, anomaly_score, confidence, evidence)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                        RETURNING id, created_at
+                        """,
+                        (
+                            event_id,
+                            classification.get("labels", []),
+                            summary,
+                            anomaly,
+                            classification.get("confidence", 0.0),
+                            json.dumps(classification.get("evidence", [])),
+                        ),
+                    )
+                    incident_id, incident_created_at = cur.fetchone()
+                    conn.commit()
+                # Spikes are not offered as coalescing targets either, so later normal
+                # readings cannot fold into (and inflate) a spike incident
+                if recent_incidents and not is_spike:
+                    recent_incidents.add(service, labels, embedding, incident_id, incident_created_at)
 
                 # Index into pgvector
-                index_incident(
-                    {
-                        "id": incident_id,
-                        "summary": summary,
-                        "labels": classification.get("labels", []),
-                        "service": event_data["source"],
-                        "type": event_data.get("type", ""),
-                        "timestamp": str(event_data["created_at"]),
-                    },
-                    embedding,
-                )
-
-                print(f"Created incident {incident_id} for event {event_id}")
+                with timed("index_incident"):
+                    index_incident(
+                        {
+                            "id": incident_id,
+                            "summary": summary,
+                            "labels": classification.get("labels", []),
+                            "service": event_data["source"],
+                            "type": event_data.get("type", ""),
+                            "timestamp": str(event_data["created_at"]),
+                        },
+                        embedding,
+                    )
+
+                log.info("Created incident %s for event %s", incident_id, event_id)
 
                 # 🚀 NEW: Publish notification to Redis for Agent
                 if redis_client:
-                    publish_incident_notification(redis_client, incident_id, event_data)
+                    with timed("notify_publish"):
+                        publish_incident_notification(redis_client, incident_id, event_data)
 
                 return incident_id  # Return incident_id so we can notify about it
 
-    except Exception as e:
-        print(f"Error processing event {event_id}: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error processing event %s", event_id)
         return None
 
-    except Exception as e:
-        print(f"Error processing event {event_id}: {e}")
-        import traceback
-        traceback.print_exc()
+
+def warm_up(redis_client):
+    """Check Redis/Postgres and preload the embedding model before taking events"""
+    t0 = time.perf_counter()
+    while True:
+        try:
+            redis_client.ping()
+            with psycopg.connect(settings.DATABASE_URL) as conn:
+                conn.execute("SELECT 1")
+            encode_s = warm_up_embedder()
+            break
+        except Exception:
+            log.exception("Warm-up failed, retrying")
+            time.sleep(2)
+    elapsed = time.perf_counter() - t0
+    WARMUP_SECONDS.set(elapsed)
+    READY.set(1)
+    log.info("Worker ready after %.2fs warm-up (model load + first encode %.2fs)", elapsed, encode_s)
+    return elapsed
 
 
 def main():
     """Main worker loop"""
-    print("Starting processor worker...")
+    logging.basicConfig(
+        level=os.environ.get("LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    log.info("Starting processor worker...")
 
     # Require REDIS_URL (Upstash). Fail fast with clear message if missing.
     if not getattr(settings, "REDIS_URL", None):
         raise RuntimeError("REDIS_URL is required and should point to an Upstash TLS URL (rediss://...)")
     r = redis.from_url(settings.REDIS_URL)
 
+    metrics_port = int(os.environ.get("METRICS_PORT", 9100))
+    start_metrics_server(metrics_port)
+    log.info("Serving Prometheus metrics on :%d/metrics", metrics_port)
+
+    warm_up(r)
+
     queue = settings.QUEUE_NAME
-    print(f"Listening for events on queue: {queue}")
-    print(f"Will publish notifications to: agent_notifications queue")
+    log.info("Listening for events on queue: %s", queue)
+    log.info("Will publish notifications to: agent_notifications queue")
 
+    next_depth_sample = 0.0
+    next_partition_topup = 0.0
     while True:
         try:
+            now = time.time()
+            if next_partition_topup is not None and now >= next_partition_topup:
+                try:
+                    # None = unpartitioned schema; nothing to top up
+                    next_partition_topup = now + PARTITION_TOPUP_INTERVAL if top_up_partitions() else None
+                except Exception:
+                    log.exception("Partition top-up failed")
+                    next_partition_topup = now + 60
+            if now >= next_depth_sample:
+                QUEUE_DEPTH.labels(queue).set(r.llen(queue))
+                # One fixed key, so the API's readiness probe is a single ZCOUNT; stale members of
+                # crashed workers are pruned here
+                r.pipeline().zadd(WORKER_READY_KEY, {READY_MEMBER: now}).zremrangebyscore(
+                    WORKER_READY_KEY, "-inf", now - WORKER_READY_TTL).execute()
+                next_depth_sample = now + QUEUE_DEPTH_INTERVAL
+
             result = r.brpop(queue, timeout=5)
             if result:
                 _, data_bytes = result
@@ -274,22 +292,32 @@ def main():
                     # Try to parse as JSON first (new format)
                     event_data = json.loads(data_str)
                     event_id = event_data.get("id")
-                except (json.JSONDecodeError, TypeError):
+                    created_at = event_data.get("created_at")
+                    enqueued_at = event_data.get("enqueued_at")
+                    if enqueued_at:
+                        QUEUE_LAG_SECONDS.observe(max(0.0, time.time() - float(enqueued_at)))
+                except (json.JSONDecodeError, TypeError, AttributeError):
                     # Fall back to old format (just event_id)
                     event_id = int(data_str)
+                    created_at = None
                 
                 if event_id:
-                    incident_id = process_event(event_id, redis_client=r)
+                    with timed("process_event"):
+                        incident_id = process_event(event_id, redis_client=r, created_at=created_at)
                     if incident_id:
-                        print(f"✅ Successfully processed event {event_id} → incident {incident_id}")
+                        EVENTS_PROCESSED.labels("ok").inc()
+                        log.info("Successfully processed event %s -> incident %s", event_id, incident_id)
                     else:
-                        print(f"❌ Failed to process event {event_id}")
+                        EVENTS_PROCESSED.labels("failed").inc()
+                        log.warning("Failed to process event %s", event_id)
                         
         except KeyboardInterrupt:
-            print("Worker stopped")
+            log.info("Worker stopped")
+            READY.set(0)
+            r.zrem(WORKER_READY_KEY, READY_MEMBER)
             break
-        except Exception as e:
-            print(f"Worker error: {e}")
+        except Exception:
+            log.exception("Worker error")
             time.sleep(1)
 
 if __name__ == "__main__":